@@ -0,0 +1,246 @@
+import logging
+
+import cv2 as open_cv
+import numpy as np
+
+from colors import COLOR_GREEN, COLOR_WHITE
+from drawing_utils import draw_contours
+from spot_layout import SpotLayout
+
+
+class AddSpot:
+    def __init__(self, spot_id, coordinates, zone=None):
+        self.spot_id = spot_id
+        self.coordinates = coordinates
+        self.zone = zone
+
+    def apply(self, layout):
+        layout.add(self.spot_id, self.coordinates, self.zone)
+
+    def revert(self, layout):
+        layout.remove(self.spot_id)
+
+
+class DeleteSpot(AddSpot):
+    def apply(self, layout):
+        super().revert(layout)
+
+    def revert(self, layout):
+        super().apply(layout)
+
+
+class MoveSpot:
+    def __init__(self, spot_id, before, after):
+        self.spot_id = spot_id
+        self.before = before
+        self.after = after
+
+    def apply(self, layout):
+        layout.move(self.spot_id, self.after)
+
+    def revert(self, layout):
+        layout.move(self.spot_id, self.before)
+
+
+class CoordinatesEditor:
+    """
+    Interactive editor over a `SpotLayout`.
+
+    Click four corners on empty ground to add a spot; click inside a spot to
+    select it and drag to move it. Only the screen regions touched by an edit
+    are redrawn, so the cost of an edit does not depend on the spot count.
+    Nothing is written until the layout is saved, which replaces the output
+    file in one step.
+    """
+
+    KEY_DELETE = ord("d")
+    KEY_UNDO = ord("u")
+    KEY_REDO = ord("y")
+    KEY_CTRL_Z = 26
+    KEY_CTRL_Y = 25
+    KEY_RESET = ord("r")
+    KEY_SAVE = ord("s")
+    KEY_QUIT = ord("q")
+    EDIT_KEYS = (KEY_DELETE, KEY_UNDO, KEY_REDO, KEY_CTRL_Z, KEY_CTRL_Y)
+
+    def __init__(self, image, output_path, color, layout=None):
+        self.caption = image
+        self.output_path = output_path
+        self.color = color
+        self.layout = layout if layout is not None else SpotLayout()
+
+        self.base = open_cv.imread(image)
+        self.canvas = self.base.copy()
+        self.pending = []
+        self.selected = None
+        self.drag_origin = None
+        self.drag_before = None
+        self.undo_stack = []
+        self.redo_stack = []
+
+        self.__redraw((0, 0, self.base.shape[1], self.base.shape[0]))
+
+        open_cv.namedWindow(self.caption, open_cv.WINDOW_GUI_EXPANDED)
+        open_cv.setMouseCallback(self.caption, self.__mouse_callback)
+
+    def generate(self):
+        while True:
+            open_cv.imshow(self.caption, self.canvas)
+            key = open_cv.waitKey(0)
+
+            if self.drag_origin is not None and key in CoordinatesEditor.EDIT_KEYS:
+                # Finish the drag first; editing the spot under the mouse would leave it half moved.
+                continue
+            if key in (CoordinatesEditor.KEY_UNDO, CoordinatesEditor.KEY_CTRL_Z):
+                self.undo()
+            elif key in (CoordinatesEditor.KEY_REDO, CoordinatesEditor.KEY_CTRL_Y):
+                self.redo()
+            elif key == CoordinatesEditor.KEY_DELETE and self.selected is not None:
+                self.execute(DeleteSpot(self.selected,
+                                    self.layout.coordinates(self.selected),
+                                    self.layout.zones.get(self.selected)))
+            elif key == CoordinatesEditor.KEY_RESET:
+                self.__clear_pending()
+            elif key == CoordinatesEditor.KEY_SAVE:
+                self.save()
+            elif key == CoordinatesEditor.KEY_QUIT:
+                break
+        self.save()
+        open_cv.destroyWindow(self.caption)
+
+    def save(self):
+        self.layout.save(self.output_path)
+        logging.info("Saved %s spots to %s", len(self.layout), self.output_path)
+
+    def execute(self, command):
+        self.redo_stack.clear()
+        self.undo_stack.append(command)
+        self.__touch(command.apply, command)
+
+    def undo(self):
+        if self.undo_stack:
+            command = self.undo_stack.pop()
+            self.redo_stack.append(command)
+            self.__touch(command.revert, command)
+
+    def redo(self):
+        if self.redo_stack:
+            command = self.redo_stack.pop()
+            self.undo_stack.append(command)
+            self.__touch(command.apply, command)
+
+    def __touch(self, action, command):
+        before = self.__spot_region(command.spot_id)
+        action(self.layout)
+        if self.selected == command.spot_id:
+            self.__end_drag()
+            if command.spot_id not in self.layout:
+                self.selected = None
+        self.__redraw(self.__union(before, self.__spot_region(command.spot_id)))
+
+    def __mouse_callback(self, event, x, y, flags, params):
+        if event == open_cv.EVENT_LBUTTONDOWN:
+            hit = self.layout.hit_test(x, y) if not self.pending else None
+            if hit is not None:
+                self.__select(hit)
+                self.drag_origin = (x, y)
+                self.drag_before = self.layout.coordinates(hit).copy()
+            else:
+                self.__select(None)
+                self.__add_point(x, y)
+
+        elif event == open_cv.EVENT_MOUSEMOVE and self.__dragging():
+            self.__drag_to(x, y)
+
+        elif event == open_cv.EVENT_LBUTTONUP and self.__dragging():
+            self.__drag_to(x, y)
+            after = self.layout.coordinates(self.selected).copy()
+            if not np.array_equal(after, self.drag_before):
+                self.undo_stack.append(MoveSpot(self.selected, self.drag_before, after))
+                self.redo_stack.clear()
+            self.__end_drag()
+
+        else:
+            return
+
+        open_cv.imshow(self.caption, self.canvas)
+
+    def __dragging(self):
+        if self.drag_origin is not None and self.selected not in self.layout:
+            self.__end_drag()
+        return self.drag_origin is not None
+
+    def __drag_to(self, x, y):
+        offset = np.array([x - self.drag_origin[0], y - self.drag_origin[1]], dtype=np.int32)
+        region = self.__spot_region(self.selected)
+        self.layout.move(self.selected, self.drag_before + offset)
+        self.__redraw(self.__union(region, self.__spot_region(self.selected)))
+
+    def __end_drag(self):
+        self.drag_origin = None
+        self.drag_before = None
+
+    def __add_point(self, x, y):
+        self.pending.append((x, y))
+        if len(self.pending) < 4:
+            self.__redraw(self.__pending_region())
+            return
+
+        coordinates = np.array(self.pending, dtype=np.int32)
+        region = self.__pending_region()
+        self.pending = []
+        self.__redraw(region)
+        self.execute(AddSpot(self.layout.next_id, coordinates))
+
+    def __clear_pending(self):
+        if self.pending:
+            region = self.__pending_region()
+            self.pending = []
+            self.__redraw(region)
+
+    def __select(self, spot_id):
+        previous = self.selected
+        self.selected = spot_id
+        for changed in (previous, spot_id):
+            if changed is not None and changed in self.layout:
+                self.__redraw(self.__spot_region(changed))
+
+    def __spot_region(self, spot_id):
+        if spot_id is None or spot_id not in self.layout:
+            return None
+        return self.layout.bounds(spot_id)
+
+    def __pending_region(self):
+        x, y, w, h = open_cv.boundingRect(np.array(self.pending, dtype=np.int32))
+        return (x - 2, y - 2, w + 4, h + 4)
+
+    @staticmethod
+    def __union(a, b):
+        if a is None or b is None:
+            return a or b
+        x0, y0 = min(a[0], b[0]), min(a[1], b[1])
+        x1 = max(a[0] + a[2], b[0] + b[2])
+        y1 = max(a[1] + a[3], b[1] + b[3])
+        return (x0, y0, x1 - x0, y1 - y0)
+
+    def __redraw(self, region):
+        if region is None:
+            return
+
+        height, width = self.base.shape[:2]
+        x0, y0 = max(region[0], 0), max(region[1], 0)
+        x1 = min(region[0] + region[2], width)
+        y1 = min(region[1] + region[3], height)
+        if x1 <= x0 or y1 <= y0:
+            return
+
+        view = self.canvas[y0:y1, x0:x1]
+        view[:] = self.base[y0:y1, x0:x1]
+        offset = np.array([x0, y0], dtype=np.int32)
+
+        for spot_id in self.layout.in_rect((x0, y0, x1 - x0, y1 - y0)):
+            color = COLOR_GREEN if spot_id == self.selected else self.color
+            draw_contours(view, self.layout.coordinates(spot_id) - offset, str(spot_id + 1), COLOR_WHITE, color)
+
+        for start, end in zip(self.pending, self.pending[1:]):
+            open_cv.line(view, (start[0] - x0, start[1] - y0), (end[0] - x0, end[1] - y0), (255, 0, 0), 1)
@@ -15,6 +15,7 @@ class CoordinatesGenerator:
         self.color = color
 
         self.image = open_cv.imread(image).copy()
+        self.committed = self.image.copy()
         self.click_count = 0
         self.ids = 0
         self.coordinates = []
@@ -28,7 +29,7 @@ class CoordinatesGenerator:
             key = open_cv.waitKey(0)
 
             if key == CoordinatesGenerator.KEY_RESET:
-                self.image = self.image.copy()
+                self.__reset_pending()
             elif key == CoordinatesGenerator.KEY_QUIT:
                 break
         open_cv.destroyWindow(self.caption)
@@ -47,6 +48,11 @@ class CoordinatesGenerator:
 
         open_cv.imshow(self.caption, self.image)
 
+    def __reset_pending(self):
+        self.image = self.committed.copy()
+        self.coordinates = []
+        self.click_count = 0
+
     def __handle_click_progress(self):
         open_cv.line(self.image, self.coordinates[-2], self.coordinates[-1], (255, 0, 0), 1)
 
@@ -78,3 +84,4 @@ class CoordinatesGenerator:
             self.coordinates.pop()
 
         self.ids += 1
+        self.committed = self.image.copy()
@@ -16,10 +16,9 @@ def draw_contours(image,
                          color=border_color,
                          thickness=2,
                          lineType=open_cv.LINE_8)
-    moments = open_cv.moments(coordinates)
-
-    center = (int(moments["m10"] / moments["m00"]) - 3,
-              int(moments["m01"] / moments["m00"]) + 3)
+    center = label_origin(coordinates)
+    if center is None:
+        return
 
     open_cv.putText(image,
                     label,
@@ -29,3 +28,12 @@ def draw_contours(image,
                     font_color,
                     line_thickness,
                     open_cv.LINE_AA)
+
+
+def label_origin(coordinates):
+    moments = open_cv.moments(coordinates)
+    if moments["m00"] == 0:
+        return None
+
+    return (int(moments["m10"] / moments["m00"]) - 3,
+            int(moments["m01"] / moments["m00"]) + 3)
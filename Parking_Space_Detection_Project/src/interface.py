@@ -1,10 +1,11 @@
 import os
 import sys
-import subprocess
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from tkinter import ttk
 
+from job_panel import JobsPanel
+
 
 class ParkingInterface(ttk.Frame):
     def __init__(self, master=None):
@@ -155,9 +156,19 @@ class ParkingInterface(ttk.Frame):
         # Buttons
         btns = ttk.Frame(card, style="Card.TFrame")
         btns.grid(row=11, column=0, columnspan=3, sticky="e")
-        ttk.Button(btns, text="Quit", command=self.master.destroy).grid(row=0, column=0, padx=(0, 10))
+        ttk.Button(btns, text="Quit", command=self._quit).grid(row=0, column=0, padx=(0, 10))
         ttk.Button(btns, text="Run", command=self._run).grid(row=0, column=1)
 
+        # Jobs
+        self.jobs = JobsPanel(card, style="Card.TFrame")
+        self.jobs.grid(row=12, column=0, columnspan=3, sticky="ew", pady=(12, 0))
+        self.master.protocol("WM_DELETE_WINDOW", self._quit)
+
+    def _quit(self):
+        self.master.withdraw()
+        self.jobs.manager.shutdown()
+        self.master.destroy()
+
 
     def _on_mode_change(self):
         mode = self.mode_var.get()
@@ -259,14 +270,15 @@ class ParkingInterface(ttk.Frame):
             return
 
         # Build the command line (same structure as your original)
-        cmd = [sys.executable, self.main_py, "--data", data_file, "--video", video_file, "--start-frame", start_frame]
+        cmd = [sys.executable, self.main_py, "--data", data_file, "--video", video_file, "--start-frame", start_frame,
+               "--progress"]
 
         if mode == "generate":
             cmd.insert(3, "--image")
             cmd.insert(4, image_file)
 
         try:
-            subprocess.Popen(cmd)
+            self.jobs.start(cmd, video_file)
             if mode == "generate":
                 msg = (
                     "Coordinate generation has started.\n\n"
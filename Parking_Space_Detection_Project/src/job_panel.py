@@ -0,0 +1,68 @@
+import os
+import tkinter as tk
+from tkinter import ttk
+
+from jobs import JobManager
+
+
+class JobsPanel(ttk.Frame):
+    """Table of running detection jobs with live throughput and a cancel button."""
+
+    POLL_MS = 250
+    COLUMNS = (
+        ("job", "Job", 220),
+        ("state", "Status", 80),
+        ("progress", "Frame", 110),
+        ("fps", "FPS", 60),
+        ("lag", "Lag (s)", 70),
+    )
+
+    def __init__(self, master, manager=None, **kwargs):
+        super().__init__(master, **kwargs)
+        self.manager = manager if manager is not None else JobManager()
+
+        self.table = ttk.Treeview(self, columns=[c[0] for c in self.COLUMNS], show="headings", height=4)
+        for key, title, width in self.COLUMNS:
+            self.table.heading(key, text=title)
+            self.table.column(key, width=width, anchor="w" if key == "job" else "e")
+        self.table.grid(row=0, column=0, sticky="ew")
+
+        ttk.Button(self, text="Cancel Job", command=self._cancel_selected).grid(row=1, column=0, sticky="e", pady=(6, 0))
+        self.columnconfigure(0, weight=1)
+
+        self.after(self.POLL_MS, self._poll)
+
+    def start(self, cmd, name):
+        job = self.manager.start(cmd, name)
+        self.table.insert("", tk.END, iid=str(job.id), values=self._row(job))
+        return job
+
+    def _cancel_selected(self):
+        for iid in self.table.selection():
+            self.manager.cancel(int(iid))
+            self._refresh(int(iid))
+
+    def _poll(self):
+        for job_id in self.manager.poll():
+            self._refresh(job_id)
+        self.after(self.POLL_MS, self._poll)
+
+    def _refresh(self, job_id):
+        job = self.manager.jobs[job_id]
+        self.table.item(str(job_id), values=self._row(job))
+
+    @staticmethod
+    def _row(job):
+        progress = job.progress
+        position = progress.get("position")
+        total = progress.get("total")
+        if position is None:
+            frame = ""
+        elif total:
+            frame = "%s / %s" % (position, total)
+        else:
+            frame = str(position)
+
+        fps = "%.1f" % progress["fps"] if "fps" in progress else ""
+        lag = "%+.1f" % progress["lag"] if "lag" in progress else ""
+        return ("%s: %s" % (job.id, os.path.basename(job.name)), job.state, frame, fps, lag)
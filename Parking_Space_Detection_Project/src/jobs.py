@@ -0,0 +1,215 @@
+import itertools
+import json
+import logging
+import queue
+import subprocess
+import sys
+import threading
+import time
+
+CANCEL_COMMAND = "cancel"
+
+
+class ProgressTracker:
+    """
+    Turns per-frame positions into throughput figures.
+
+    `callback` receives a dict with the frame `position`, `total` frames (None
+    for live sources), processing `fps` and `lag`: how many seconds the
+    analysis is behind real time since it started. It is called at most once
+    per `interval` seconds.
+    """
+
+    def __init__(self, callback, total=None, interval=0.5):
+        self.callback = callback
+        self.total = total if total and total > 0 else None
+        self.interval = interval
+
+        self.started = None
+        self.start_media = None
+        self.last_report = 0.0
+        self.last_frames = 0
+        self.frames = 0
+
+    def update(self, position, media_seconds):
+        now = time.monotonic()
+        if self.started is None:
+            self.started = now
+            self.start_media = media_seconds
+            self.last_report = now
+        self.frames += 1
+
+        if now - self.last_report < self.interval:
+            return
+
+        fps = (self.frames - self.last_frames) / (now - self.last_report)
+        lag = (now - self.started) - (media_seconds - self.start_media)
+        self.last_report = now
+        self.last_frames = self.frames
+        self.callback({"position": int(position), "total": self.total, "fps": fps, "lag": lag})
+
+
+class JsonProgressWriter:
+    """Progress callback writing one JSON object per line, for `JobManager` to read."""
+
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdout
+
+    def __call__(self, progress):
+        self.stream.write(json.dumps(dict(progress, event="progress")) + "\n")
+        self.stream.flush()
+
+
+def watch_for_cancel(stream=None):
+    """
+    Return an event set when `CANCEL_COMMAND` or end of file arrives on `stream`.
+
+    End of file counts as a cancel so a job stops when its manager goes away.
+    """
+    stream = stream if stream is not None else sys.stdin
+    cancel = threading.Event()
+
+    def watch():
+        for line in stream:
+            if line.strip() == CANCEL_COMMAND:
+                break
+        cancel.set()
+
+    threading.Thread(target=watch, name="cancel-watch", daemon=True).start()
+    return cancel
+
+
+class Job:
+    RUNNING = "running"
+    CANCELLING = "cancelling"
+    FINISHED = "finished"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, job_id, name, process):
+        self.id = job_id
+        self.name = name
+        self.process = process
+        self.state = Job.RUNNING
+        self.progress = {}
+
+    @property
+    def done(self):
+        return self.state in (Job.FINISHED, Job.FAILED, Job.CANCELLED)
+
+
+class JobManager:
+    """
+    Runs detection commands as child processes and collects their progress.
+
+    Each child is expected to write `JsonProgressWriter` lines on stdout and
+    to stop on `CANCEL_COMMAND` over stdin. Reader threads forward updates to
+    a queue; `poll` is meant to be called periodically from the GUI thread and
+    is the only place job state changes.
+    """
+
+    CANCEL_TIMEOUT = 5.0
+
+    def __init__(self):
+        self.jobs = {}
+        self._ids = itertools.count(1)
+        self._updates = queue.Queue()
+
+    def start(self, cmd, name=None):
+        process = subprocess.Popen(cmd,
+                                   stdin=subprocess.PIPE,
+                                   stdout=subprocess.PIPE,
+                                   text=True,
+                                   bufsize=1)
+        job = Job(next(self._ids), name or " ".join(cmd), process)
+        self.jobs[job.id] = job
+
+        threading.Thread(target=self._read, args=(job.id, process), name="job-%s" % job.id, daemon=True).start()
+        logging.info("Started job %s: %s", job.id, job.name)
+        return job
+
+    def cancel(self, job_id):
+        job = self.jobs[job_id]
+        if job.done or job.state == Job.CANCELLING:
+            return
+
+        job.state = Job.CANCELLING
+        try:
+            job.process.stdin.write(CANCEL_COMMAND + "\n")
+            job.process.stdin.flush()
+        except (BrokenPipeError, OSError, ValueError):
+            pass
+
+        def escalate():
+            try:
+                job.process.wait(JobManager.CANCEL_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                logging.warning("Job %s did not stop, terminating it", job_id)
+                job.process.terminate()
+
+        threading.Thread(target=escalate, daemon=True).start()
+
+    def cancel_all(self):
+        for job_id in list(self.jobs):
+            self.cancel(job_id)
+
+    def shutdown(self, timeout=None):
+        """
+        Cancel every job and wait for them to exit, terminating those still
+        running after `timeout` seconds. Blocks, so no job outlives the caller
+        even though the `cancel` fallback threads are daemons.
+        """
+        timeout = JobManager.CANCEL_TIMEOUT if timeout is None else timeout
+        self.cancel_all()
+
+        deadline = time.monotonic() + timeout
+        for job in self.jobs.values():
+            try:
+                job.process.wait(max(deadline - time.monotonic(), 0))
+            except subprocess.TimeoutExpired:
+                logging.warning("Job %s did not stop, terminating it", job.id)
+                job.process.terminate()
+
+        for job in self.jobs.values():
+            try:
+                job.process.wait(timeout)
+            except subprocess.TimeoutExpired:
+                logging.warning("Job %s ignored terminate, killing it", job.id)
+                job.process.kill()
+                job.process.wait()
+
+    def poll(self):
+        """Apply pending updates and return the ids of jobs that changed."""
+        changed = set()
+        while True:
+            try:
+                job_id, update = self._updates.get_nowait()
+            except queue.Empty:
+                return changed
+
+            job = self.jobs[job_id]
+            if update.get("event") == "progress":
+                job.progress = update
+            elif update.get("event") == "exit":
+                if job.state == Job.CANCELLING:
+                    job.state = Job.CANCELLED
+                else:
+                    job.state = Job.FINISHED if update["returncode"] == 0 else Job.FAILED
+                logging.info("Job %s %s", job_id, job.state)
+            changed.add(job_id)
+
+    def _read(self, job_id, process):
+        for line in process.stdout:
+            try:
+                update = json.loads(line)
+            except ValueError:
+                logging.debug("job %s: %s", job_id, line.rstrip())
+                continue
+            self._updates.put((job_id, update))
+
+        returncode = process.wait()
+        try:
+            process.stdin.close()
+        except (BrokenPipeError, OSError):
+            pass
+        self._updates.put((job_id, {"event": "exit", "returncode": returncode}))
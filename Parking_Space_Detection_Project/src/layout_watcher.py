@@ -0,0 +1,126 @@
+import logging
+import os
+import queue
+import threading
+
+import yaml
+
+
+class LayoutUpdate:
+    def __init__(self, spots, compiled, removed):
+        self.spots = spots
+        self.compiled = compiled
+        self.removed = removed
+
+
+class LayoutWatcher(threading.Thread):
+    """
+    Watches a coordinates file and prepares layout updates off the analysis thread.
+
+    The file is polled every `interval` seconds and only read once its size
+    and modification time have stayed the same for a whole interval, so a file
+    still being written is not picked up half way. The new spots are compared
+    by id with the last layout handed out; `compile_spot` only runs for spots
+    that are new or whose coordinates changed. Updates must be applied in the
+    order `poll` returns them.
+    """
+
+    INTERVAL = 1.0
+
+    def __init__(self, path, spots, compile_spot, interval=None):
+        super().__init__(name="layout-watcher", daemon=True)
+        self.path = path
+        self.compile_spot = compile_spot
+        self.interval = self.INTERVAL if interval is None else interval
+
+        self._current = self._by_id(spots)
+        self._updates = queue.Queue()
+        self._stopped = threading.Event()
+        self._signature = self._stat()
+
+    def poll(self):
+        updates = []
+        while True:
+            try:
+                updates.append(self._updates.get_nowait())
+            except queue.Empty:
+                return updates
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def run(self):
+        pending = None
+        while not self._stopped.wait(self.interval):
+            signature = self._stat()
+            if signature is None or signature == self._signature:
+                pending = None
+                continue
+            if signature != pending:
+                pending = signature
+                continue
+
+            self._signature = signature
+            pending = None
+            try:
+                update = self._load()
+            except (OSError, yaml.YAMLError, ValueError) as e:
+                logging.warning("Ignoring unreadable layout %s: %s", self.path, e)
+                continue
+            except Exception:
+                # Never let one bad save end the watch for the rest of the run.
+                logging.exception("Ignoring layout %s that could not be compiled", self.path)
+                continue
+            if update is not None:
+                self._updates.put(update)
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self):
+        with open(self.path, "r") as data:
+            spots = yaml.load(data, Loader=yaml.FullLoader) or []
+
+        latest = self._by_id(spots)
+        compiled = {}
+        for spot_id, spot in latest.items():
+            previous = self._current.get(spot_id)
+            if previous is None or previous["coordinates"] != spot["coordinates"]:
+                compiled[spot_id] = self.compile_spot(spot)
+
+        removed = set(self._current) - set(latest)
+        rezoned = any(spot.get("zone") != self._current[spot_id].get("zone")
+                      for spot_id, spot in latest.items() if spot_id not in compiled)
+        if not compiled and not removed and not rezoned:
+            return None
+
+        self._current = latest
+        return LayoutUpdate(spots, compiled, removed)
+
+    @staticmethod
+    def _by_id(spots):
+        if not isinstance(spots, list):
+            raise ValueError("expected a list of spots")
+
+        by_id = {}
+        for spot in spots:
+            if not isinstance(spot, dict) or "id" not in spot or "coordinates" not in spot:
+                raise ValueError("every spot needs an id and coordinates")
+            if not LayoutWatcher._valid_coordinates(spot["coordinates"]):
+                raise ValueError("spot %s needs at least three [x, y] points" % spot["id"])
+            if spot["id"] in by_id:
+                raise ValueError("duplicate spot id %s" % spot["id"])
+            by_id[spot["id"]] = spot
+        return by_id
+
+    @staticmethod
+    def _valid_coordinates(coordinates):
+        return (isinstance(coordinates, list) and len(coordinates) >= 3 and
+                all(isinstance(point, list) and len(point) == 2 and
+                    all(isinstance(value, (int, float)) and not isinstance(value, bool) for value in point)
+                    for point in coordinates))
@@ -1,17 +1,26 @@
 import argparse
 import logging
+import os
 import sys
 from typing import Optional
 
 import yaml
+from coordinates_editor import CoordinatesEditor
 from coordinates_generator import CoordinatesGenerator
+from jobs import JsonProgressWriter, watch_for_cancel
 from motion_detector import MotionDetector
+from quiet_gate import QuietGate
+from registration import ShiftEstimator
+from scorers import SCORERS, create_scorer
+from spot_layout import SpotLayout
 from colors import COLOR_RED
 
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from tkinter import ttk
 
+from job_panel import JobsPanel
+
 
 logger = logging.getLogger(__name__)
 
@@ -34,23 +43,42 @@ def run(
     video_file: str,
     data_file: str,
     start_frame: int,
+    render_fps: Optional[float] = None,
+    record_file: Optional[str] = None,
+    show: bool = True,
+    scorer: str = "laplacian",
+    threshold: Optional[float] = None,
+    edit: bool = False,
+    progress=None,
+    cancel=None,
+    capture_file: Optional[str] = None,
+    quiet_gate: Optional[float] = None,
+    stabilize: Optional[float] = None,
+    watch: bool = True,
 ) -> None:
     """
     Core workflow.
 
     Preserves original behavior:
     1) If image_file is provided -> generate coordinates into data_file
+       (with edit=True, open the existing layout in the editor instead)
     2) Always -> load YAML and run motion detection
     """
     logger.info(
-        "Running with image=%s, video=%s, data=%s, start_frame=%s",
+        "Running with image=%s, video=%s, data=%s, start_frame=%s, scorer=%s",
         image_file,
         video_file,
         data_file,
         start_frame,
+        scorer,
     )
 
-    if image_file is not None:
+    if image_file is not None and edit:
+        logger.info("Image file provided, editing coordinates...")
+        layout = SpotLayout.load(data_file) if os.path.exists(data_file) else SpotLayout()
+        editor = CoordinatesEditor(image_file, data_file, COLOR_RED, layout)
+        editor.generate()
+    elif image_file is not None:
         logger.info("Image file provided, generating coordinates...")
         with open(data_file, "w+") as points_file:
             generator = CoordinatesGenerator(image_file, points_file, COLOR_RED)
@@ -62,7 +90,21 @@ def run(
         points = yaml.load(data, Loader=yaml.FullLoader)
 
     logger.info("Starting motion detection...")
-    detector = MotionDetector(video_file, points, int(start_frame))
+    detector = MotionDetector(
+        video_file,
+        points,
+        int(start_frame),
+        render_fps=render_fps,
+        record_file=record_file,
+        show=show,
+        scorer=create_scorer(scorer, threshold),
+        progress=progress,
+        cancel=cancel,
+        capture_file=capture_file,
+        gate=QuietGate(quiet_gate) if quiet_gate is not None else None,
+        stabilizer=ShiftEstimator(stabilize) if stabilize is not None else None,
+        coordinates_file=data_file if watch else None,
+    )
     detector.detect_motion()
     logger.info("Motion detection finished.")
 
@@ -102,6 +144,97 @@ def parse_args() -> argparse.Namespace:
         help="Starting frame on the video",
     )
 
+    parser.add_argument(
+        "--render-fps",
+        dest="render_fps",
+        type=float,
+        required=False,
+        default=None,
+        help="Maximum rate of annotated frames (default: every analysed frame)",
+    )
+
+    parser.add_argument(
+        "--record",
+        dest="record_file",
+        required=False,
+        help="Also write the annotated video to this file",
+    )
+
+    parser.add_argument(
+        "--no-display",
+        dest="show",
+        action="store_false",
+        help="Do not open the preview window",
+    )
+
+    parser.add_argument(
+        "--scorer",
+        dest="scorer",
+        required=False,
+        default="laplacian",
+        choices=sorted(SCORERS),
+        help="Occupancy scorer backend",
+    )
+
+    parser.add_argument(
+        "--threshold",
+        dest="threshold",
+        type=float,
+        required=False,
+        default=None,
+        help="Score below which a spot is free (default: the scorer's own)",
+    )
+
+    parser.add_argument(
+        "--edit",
+        dest="edit",
+        action="store_true",
+        help="Edit the existing coordinates in --data on --image instead of starting over",
+    )
+
+    parser.add_argument(
+        "--progress",
+        dest="progress",
+        action="store_true",
+        help="Write JSON progress lines to stdout and stop on 'cancel' or end of stdin",
+    )
+
+    parser.add_argument(
+        "--capture",
+        dest="capture_file",
+        required=False,
+        help="Also save the grayscale spot crops to this ROI archive for replay.py",
+    )
+
+    parser.add_argument(
+        "--quiet-gate",
+        dest="quiet_gate",
+        type=float,
+        nargs="?",
+        const=QuietGate.THRESHOLD,
+        default=None,
+        help="Skip analysis of frames that barely differ from the last analysed one "
+             "(optional gray-level threshold, default %s)" % QuietGate.THRESHOLD,
+    )
+
+    parser.add_argument(
+        "--stabilize",
+        dest="stabilize",
+        type=float,
+        nargs="?",
+        const=ShiftEstimator.INTERVAL,
+        default=None,
+        help="Follow small camera shifts relative to the first frame "
+             "(optional seconds between estimates, default %s)" % ShiftEstimator.INTERVAL,
+    )
+
+    parser.add_argument(
+        "--no-watch",
+        dest="watch",
+        action="store_false",
+        help="Do not reload the data file when it changes during detection",
+    )
+
     return parser.parse_args()
 
 
@@ -109,11 +242,26 @@ def main_cli() -> None:
     """Run using the original CLI style."""
     configure_logging()
     args = parse_args()
+    progress, cancel = None, None
+    if args.progress:
+        progress, cancel = JsonProgressWriter(), watch_for_cancel()
     run(
         image_file=args.image_file,
         video_file=args.video_file,
         data_file=args.data_file,
         start_frame=int(args.start_frame),
+        render_fps=args.render_fps,
+        record_file=args.record_file,
+        show=args.show,
+        scorer=args.scorer,
+        threshold=args.threshold,
+        edit=args.edit,
+        progress=progress,
+        cancel=cancel,
+        capture_file=args.capture_file,
+        quiet_gate=args.quiet_gate,
+        stabilize=args.stabilize,
+        watch=args.watch,
     )
 
 
@@ -130,6 +278,7 @@ class App(tk.Tk):
 
         self._setup_theme()
         self._build_ui()
+        self.protocol("WM_DELETE_WINDOW", self.on_quit)
 
     def _setup_theme(self) -> None:
         
@@ -238,9 +387,13 @@ class App(tk.Tk):
         # Buttons (Run aligned with others: default TButton style)
         btns = ttk.Frame(card, style="Card.TFrame")
         btns.grid(row=10, column=0, sticky="e")
-        ttk.Button(btns, text="Quit", command=self.destroy).grid(row=0, column=0, padx=(0, 10))
+        ttk.Button(btns, text="Quit", command=self.on_quit).grid(row=0, column=0, padx=(0, 10))
         ttk.Button(btns, text="Run Detection", command=self.on_run).grid(row=0, column=1)
 
+        # Jobs
+        self.jobs = JobsPanel(card, style="Card.TFrame")
+        self.jobs.grid(row=11, column=0, sticky="ew", pady=(12, 0))
+
     def browse_image(self) -> None:
         filename = filedialog.askopenfilename(
             title="Select Image File",
@@ -288,18 +441,28 @@ class App(tk.Tk):
             messagebox.showerror("Error", "Start frame must be an integer.")
             return
 
+        cmd = [
+            sys.executable,
+            os.path.abspath(__file__),
+            "--video", video_file,
+            "--data", data_file,
+            "--start-frame", str(start_frame),
+            "--progress",
+        ]
+        if image_file is not None:
+            cmd += ["--image", image_file]
+
         try:
-            configure_logging()
-            run(
-                image_file=image_file,
-                video_file=video_file,
-                data_file=data_file,
-                start_frame=start_frame,
-            )
+            self.jobs.start(cmd, video_file)
         except Exception as e:
             logger.exception("Error during execution")
             messagebox.showerror("Execution Error", str(e))
 
+    def on_quit(self) -> None:
+        self.withdraw()
+        self.jobs.manager.shutdown()
+        self.destroy()
+
 
 # =========================
 #      ENTRY POINT
@@ -309,5 +472,6 @@ if __name__ == "__main__":
     if len(sys.argv) > 1:
         main_cli()
     else:
+        configure_logging()
         app = App()
         app.mainloop()
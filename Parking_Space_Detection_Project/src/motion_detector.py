@@ -1,18 +1,36 @@
 import cv2 as open_cv
 import numpy as np
 import logging
-from drawing_utils import draw_contours
-from colors import COLOR_GREEN, COLOR_WHITE, COLOR_BLUE
+import os
+from layout_watcher import LayoutWatcher
+from renderer import AsyncVideoWriter, RenderThread, SpotOverlay
+from jobs import ProgressTracker
+from roi_archive import RoiArchiveWriter
+from scorers import LaplacianScorer
+from zones import ZoneTree
 
 
 class MotionDetector:
-    LAPLACIAN = 1.4
     DETECT_DELAY = 1
 
-    def __init__(self, video, coordinates, start_frame):
+    def __init__(self, video, coordinates, start_frame, render_fps=None, record_file=None, show=True,
+                 scorer=None, progress=None, cancel=None, capture_file=None, gate=None,
+                 stabilizer=None, coordinates_file=None):
         self.video = video
         self.coordinates_data = coordinates
         self.start_frame = start_frame
+        self.render_fps = render_fps
+        self.record_file = record_file
+        self.show = show
+        self.scorer = scorer if scorer is not None else LaplacianScorer()
+        self.progress = progress
+        self.cancel = cancel
+        self.capture_file = capture_file
+        self.gate = gate
+        self.stabilizer = stabilizer
+        self.offset = (0, 0)
+        self.coordinates_file = coordinates_file
+        self.zones = ZoneTree(coordinates)
         self.contours = []
         self.bounds = []
         self.mask = []
@@ -25,97 +43,229 @@ class MotionDetector:
         logging.debug("coordinates data: %s", coordinates_data)
 
         for p in coordinates_data:
-            coordinates = self._coordinates(p)
-            logging.debug("coordinates: %s", coordinates)
-
-            rect = open_cv.boundingRect(coordinates)
-            logging.debug("rect: %s", rect)
-
-            new_coordinates = coordinates.copy()
-            new_coordinates[:, 0] = coordinates[:, 0] - rect[0]
-            new_coordinates[:, 1] = coordinates[:, 1] - rect[1]
-            logging.debug("new_coordinates: %s", new_coordinates)
-
+            coordinates, rect, mask = self.compile_spot(p)
             self.contours.append(coordinates)
             self.bounds.append(rect)
-
-            mask = open_cv.drawContours(
-                np.zeros((rect[3], rect[2]), dtype=np.uint8),
-                [new_coordinates],
-                contourIdx=-1,
-                color=255,
-                thickness=-1,
-                lineType=open_cv.LINE_8)
-
-            mask = mask == 255
             self.mask.append(mask)
-            logging.debug("mask: %s", self.mask)
+
+        self.scorer.prepare(self.mask)
 
         statuses = [False] * len(coordinates_data)
         times = [None] * len(coordinates_data)
+        raw_statuses = list(statuses)
+        grayed = None
+
+        tracker = None
+        if self.progress is not None:
+            tracker = ProgressTracker(self.progress, int(capture.get(open_cv.CAP_PROP_FRAME_COUNT)))
+
+        archive_segment = 0
+        archive, watcher, renderer = None, None, None
+        try:
+            archive = self._archive(archive_segment)
+
+            if self.coordinates_file is not None:
+                watcher = LayoutWatcher(self.coordinates_file, coordinates_data, self.compile_spot)
+                watcher.start()
+
+            renderer = self._renderer(capture)
+            renderer.start()
+
+            while capture.isOpened() and not renderer.quit_requested.is_set():
+                if self.cancel is not None and self.cancel.is_set():
+                    logging.info("Motion detection cancelled")
+                    break
+
+                for update in watcher.poll() if watcher is not None else ():
+                    statuses, times, raw_statuses = self._reload(update, statuses, times, raw_statuses, grayed)
+                    renderer.set_overlay(self._overlay())
+                    if archive is not None:
+                        archive.close()
+                        archive_segment += 1
+                        archive = self._archive(archive_segment)
+
+                result, frame = capture.read()
+                if frame is None:
+                    break
+
+                if not result:
+                    raise CaptureReadError("Error reading video capture on frame %s" % str(frame))
+
+                position_in_seconds = capture.get(open_cv.CAP_PROP_POS_MSEC) / 1000.0
+
+                if self.gate is not None and self.gate.is_quiet(frame, position_in_seconds):
+                    # The scene has not changed, so the spots would score as they did on the last analysed frame.
+                    changed = self.update_statuses(statuses, times, raw_statuses, position_in_seconds)
+                else:
+                    blurred = open_cv.GaussianBlur(frame.copy(), (5, 5), 3)
+                    grayed = open_cv.cvtColor(blurred, open_cv.COLOR_BGR2GRAY)
+
+                    if self.stabilizer is not None:
+                        if self.stabilizer.limits is None:
+                            self.stabilizer.set_limits(self.bounds, grayed.shape)
+                        self.offset = self.stabilizer.update(grayed, position_in_seconds)
+
+                    raw_statuses = [self.__apply(grayed, index, c) for index, c in enumerate(self.coordinates_data)]
+                    changed = self.update_statuses(statuses, times, raw_statuses, position_in_seconds)
+
+                for index in changed:
+                    self.zones.update(index, statuses[index])
+
+                if archive is not None:
+                    archive.append(position_in_seconds, grayed, self.offset)
+
+                renderer.submit(frame, statuses, position_in_seconds, self.offset)
+                renderer.show()
+
+                if tracker is not None:
+                    tracker.update(capture.get(open_cv.CAP_PROP_POS_FRAMES), position_in_seconds)
+        finally:
+            # Also runs when the loop fails, so the recording and capture are finished properly.
+            if renderer is not None:
+                renderer.stop()
+            capture.release()
+            if watcher is not None:
+                watcher.stop()
+            if archive is not None:
+                archive.close()
+
+        self.scorer.log_cost_report()
+        if self.gate is not None:
+            self.gate.log_report()
+        if self.stabilizer is not None:
+            self.stabilizer.log_report()
+        for zone in self.zones.walk():
+            logging.log(logging.INFO if zone.parent is None else logging.DEBUG,
+                        "Zone %s: %s free, %s occupied",
+                        "/".join((self.zones.root.name,) + zone.path), zone.free, zone.occupied)
 
-        while capture.isOpened():
-            result, frame = capture.read()
-            if frame is None:
-                break
-
-            if not result:
-                raise CaptureReadError("Error reading video capture on frame %s" % str(frame))
-
-            blurred = open_cv.GaussianBlur(frame.copy(), (5, 5), 3)
-            grayed = open_cv.cvtColor(blurred, open_cv.COLOR_BGR2GRAY)
-            new_frame = frame.copy()
-            logging.debug("new_frame: %s", new_frame)
-
-            position_in_seconds = capture.get(open_cv.CAP_PROP_POS_MSEC) / 1000.0
-
-            for index, c in enumerate(coordinates_data):
-                status = self.__apply(grayed, index, c)
-
-                if times[index] is not None and self.same_status(statuses, index, status):
+    @staticmethod
+    def update_statuses(statuses, times, raw_statuses, position_in_seconds):
+        changed = []
+        for index, status in enumerate(raw_statuses):
+            if times[index] is not None and MotionDetector.same_status(statuses, index, status):
+                times[index] = None
+                continue
+
+            if times[index] is not None and MotionDetector.status_changed(statuses, index, status):
+                if position_in_seconds - times[index] >= MotionDetector.DETECT_DELAY:
+                    statuses[index] = status
                     times[index] = None
-                    continue
+                    changed.append(index)
+                continue
+
+            if times[index] is None and MotionDetector.status_changed(statuses, index, status):
+                times[index] = position_in_seconds
+
+        return changed
+
+    def _reload(self, update, statuses, times, raw_statuses, grayed):
+        """Switch to `update`, keeping the state of every spot whose id and coordinates are unchanged."""
+        old_indices = {p["id"]: index for index, p in enumerate(self.coordinates_data)}
+
+        contours, bounds, masks, mapping = [], [], [], []
+        new_statuses, new_times, new_raw_statuses = [], [], []
+        for p in update.spots:
+            old = old_indices.get(p["id"]) if p["id"] not in update.compiled else None
+            if old is None:
+                coordinates, rect, mask = update.compiled[p["id"]]
+                status, timer, raw_status = False, None, False
+            else:
+                coordinates, rect, mask = self.contours[old], self.bounds[old], self.mask[old]
+                status, timer, raw_status = statuses[old], times[old], raw_statuses[old]
+
+            contours.append(coordinates)
+            bounds.append(rect)
+            masks.append(mask)
+            mapping.append(old)
+            new_statuses.append(status)
+            new_times.append(timer)
+            new_raw_statuses.append(raw_status)
+
+        self.coordinates_data = update.spots
+        self.contours, self.bounds, self.mask = contours, bounds, masks
+        self.scorer.reindex(mapping, masks)
+
+        self.zones = ZoneTree(update.spots)
+        for index, status in enumerate(new_statuses):
+            if status:
+                self.zones.update(index, status)
+
+        if self.stabilizer is not None and grayed is not None:
+            self.stabilizer.set_limits(self.bounds, grayed.shape)
+            self.offset = self.stabilizer.offset
+        if self.gate is not None:
+            self.gate.reset()
+
+        logging.info("Reloaded layout from %s: %s spots, %s added or changed, %s removed",
+                     self.coordinates_file, len(update.spots), len(update.compiled), len(update.removed))
+        return new_statuses, new_times, new_raw_statuses
+
+    def _archive(self, segment):
+        if self.capture_file is None:
+            return None
+
+        path = self.capture_file
+        if segment:
+            root, extension = os.path.splitext(path)
+            path = "%s.%s%s" % (root, segment, extension)
+            logging.info("Layout changed, continuing capture in %s", path)
+
+        return RoiArchiveWriter(path, self.coordinates_data, self.bounds,
+                                metadata={"video": str(self.video), "start_frame": self.start_frame})
+
+    def _overlay(self):
+        labels = [str(p["id"] + 1) for p in self.coordinates_data]
+        return SpotOverlay(self.contours, labels)
+
+    def _renderer(self, capture):
+        overlay = self._overlay()
+
+        writer = None
+        if self.record_file is not None:
+            fps = self.render_fps or capture.get(open_cv.CAP_PROP_FPS) or 25.0
+            writer = AsyncVideoWriter(self.record_file, fps)
+
+        window = str(self.video) if self.show else None
+        return RenderThread(overlay, window, self.render_fps, writer)
 
-                if times[index] is not None and self.status_changed(statuses, index, status):
-                    if position_in_seconds - times[index] >= MotionDetector.DETECT_DELAY:
-                        statuses[index] = status
-                        times[index] = None
-                    continue
-
-                if times[index] is None and self.status_changed(statuses, index, status):
-                    times[index] = position_in_seconds
-
-            for index, p in enumerate(coordinates_data):
-                coordinates = self._coordinates(p)
+    def __apply(self, grayed, index, p):
+        rect = self.bounds[index]
+        logging.debug("rect: %s", rect)
 
-                color = COLOR_GREEN if statuses[index] else COLOR_BLUE
-                draw_contours(new_frame, coordinates, str(p["id"] + 1), COLOR_WHITE, color)
+        x = rect[0] + self.offset[0]
+        y = rect[1] + self.offset[1]
+        roi_gray = grayed[y:(y + rect[3]), x:(x + rect[2])]
+        status = self.scorer.status(roi_gray, index)
+        logging.debug("status: %s", status)
 
-            open_cv.imshow(str(self.video), new_frame)
-            k = open_cv.waitKey(1)
-            if k == ord("q"):
-                break
-        capture.release()
-        open_cv.destroyAllWindows()
+        return status
 
-    def __apply(self, grayed, index, p):
-        coordinates = self._coordinates(p)
-        logging.debug("points: %s", coordinates)
+    @staticmethod
+    def compile_spot(p):
+        coordinates = MotionDetector._coordinates(p)
+        logging.debug("coordinates: %s", coordinates)
 
-        rect = self.bounds[index]
+        rect = open_cv.boundingRect(coordinates)
         logging.debug("rect: %s", rect)
 
-        roi_gray = grayed[rect[1]:(rect[1] + rect[3]), rect[0]:(rect[0] + rect[2])]
-        laplacian = open_cv.Laplacian(roi_gray, open_cv.CV_64F)
-        logging.debug("laplacian: %s", laplacian)
+        new_coordinates = coordinates.copy()
+        new_coordinates[:, 0] = coordinates[:, 0] - rect[0]
+        new_coordinates[:, 1] = coordinates[:, 1] - rect[1]
+        logging.debug("new_coordinates: %s", new_coordinates)
 
-        coordinates[:, 0] = coordinates[:, 0] - rect[0]
-        coordinates[:, 1] = coordinates[:, 1] - rect[1]
+        mask = open_cv.drawContours(
+            np.zeros((rect[3], rect[2]), dtype=np.uint8),
+            [new_coordinates],
+            contourIdx=-1,
+            color=255,
+            thickness=-1,
+            lineType=open_cv.LINE_8)
 
-        status = np.mean(np.abs(laplacian * self.mask[index])) < MotionDetector.LAPLACIAN
-        logging.debug("status: %s", status)
+        mask = mask == 255
+        logging.debug("mask: %s", mask)
 
-        return status
+        return coordinates, rect, mask
 
     @staticmethod
     def _coordinates(p):
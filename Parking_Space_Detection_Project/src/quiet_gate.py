@@ -0,0 +1,60 @@
+import logging
+
+import cv2 as open_cv
+import numpy as np
+
+
+class QuietGate:
+    """
+    Cheap whole-frame check that lets the detector skip static frames.
+
+    Each frame is shrunk to a `width` pixel wide grayscale thumbnail and
+    compared with the thumbnail of the last analysed frame. The frame is quiet
+    when no thumbnail pixel moved by `threshold` gray levels or more. Using
+    the largest difference rather than the mean keeps a single car in a large
+    lot visible, and comparing against the last analysed frame lets slow drift
+    add up until it triggers. At least one frame every `max_interval` seconds
+    is analysed regardless.
+    """
+
+    THRESHOLD = 12
+    WIDTH = 64
+    MAX_INTERVAL = 10.0
+
+    def __init__(self, threshold=None, width=None, max_interval=None):
+        self.threshold = self.THRESHOLD if threshold is None else threshold
+        self.width = self.WIDTH if width is None else width
+        self.max_interval = self.MAX_INTERVAL if max_interval is None else max_interval
+
+        self.reference = None
+        self.reference_time = None
+        self.frames = 0
+        self.gated = 0
+
+    def is_quiet(self, frame, position_in_seconds):
+        self.frames += 1
+
+        height, width = frame.shape[:2]
+        size = (self.width, max(1, round(height * self.width / width)))
+        thumbnail = open_cv.cvtColor(open_cv.resize(frame, size, interpolation=open_cv.INTER_AREA),
+                                     open_cv.COLOR_BGR2GRAY)
+
+        if (self.reference is not None and
+                self.reference.shape == thumbnail.shape and
+                position_in_seconds - self.reference_time < self.max_interval and
+                int(np.max(open_cv.absdiff(thumbnail, self.reference))) < self.threshold):
+            self.gated += 1
+            return True
+
+        self.reference = thumbnail
+        self.reference_time = position_in_seconds
+        return False
+
+    def reset(self):
+        """Force the next frame to be analysed."""
+        self.reference = None
+
+    def log_report(self):
+        if self.frames:
+            logging.info("Quiet-period gate skipped %s of %s frames (%.1f%%)",
+                         self.gated, self.frames, 100.0 * self.gated / self.frames)
@@ -0,0 +1,79 @@
+import logging
+import time
+
+import cv2 as open_cv
+import numpy as np
+
+
+class ShiftEstimator:
+    """
+    Tracks small global camera shifts against a reference frame.
+
+    At most once every `interval` seconds of video, the grayscale frame is
+    shrunk by `scale` and phase-correlated with the equally shrunk first
+    frame. Estimates with a weak correlation peak are ignored. The result is
+    a whole-pixel (dx, dy) offset, clamped to `limits`, that the detector adds
+    to the ROI origins.
+    """
+
+    SCALE = 0.25
+    INTERVAL = 1.0
+    MIN_RESPONSE = 0.1
+
+    def __init__(self, interval=None, scale=None, min_response=None):
+        self.interval = self.INTERVAL if interval is None else interval
+        self.scale = self.SCALE if scale is None else scale
+        self.min_response = self.MIN_RESPONSE if min_response is None else min_response
+
+        self.offset = (0, 0)
+        self.limits = None
+        self.reference = None
+        self.window = None
+        self.last_estimate = None
+        self.estimates = 0
+        self.seconds = 0.0
+
+    def set_limits(self, bounds, shape):
+        """Keep every rect in `bounds` inside a frame of `shape` whatever the offset, the current one included."""
+        height, width = shape[:2]
+        if not bounds:
+            self.limits = (0, 0, 0, 0)
+        else:
+            self.limits = (-min(x for x, _, _, _ in bounds),
+                           width - max(x + w for x, _, w, _ in bounds),
+                           -min(y for _, y, _, _ in bounds),
+                           height - max(y + h for _, y, _, h in bounds))
+        self.offset = self._clamp(*self.offset)
+
+    def update(self, grayed, position_in_seconds):
+        if self.last_estimate is not None and position_in_seconds - self.last_estimate < self.interval:
+            return self.offset
+        self.last_estimate = position_in_seconds
+
+        start = time.perf_counter()
+        small = open_cv.resize(grayed, None, fx=self.scale, fy=self.scale,
+                               interpolation=open_cv.INTER_AREA).astype(np.float32)
+
+        if self.reference is None or self.reference.shape != small.shape:
+            self.reference = small
+            self.window = open_cv.createHanningWindow(small.shape[::-1], open_cv.CV_32F)
+        else:
+            (dx, dy), response = open_cv.phaseCorrelate(self.reference, small, self.window)
+            if response >= self.min_response:
+                self.offset = self._clamp(int(round(dx / self.scale)), int(round(dy / self.scale)))
+                logging.debug("camera shift: %s (response %.2f)", self.offset, response)
+
+        self.estimates += 1
+        self.seconds += time.perf_counter() - start
+        return self.offset
+
+    def _clamp(self, dx, dy):
+        if self.limits is None:
+            return dx, dy
+        min_x, max_x, min_y, max_y = self.limits
+        return min(max(dx, min_x), max_x), min(max(dy, min_y), max_y)
+
+    def log_report(self):
+        if self.estimates:
+            logging.info("Camera shift %s after %s estimates, %.2f ms each",
+                         self.offset, self.estimates, 1000.0 * self.seconds / self.estimates)
@@ -0,0 +1,337 @@
+import logging
+import queue
+import threading
+import time
+
+import cv2 as open_cv
+import numpy as np
+
+from colors import COLOR_BLUE, COLOR_GREEN, COLOR_WHITE
+from drawing_utils import label_origin
+
+
+class SpotOverlay:
+    """
+    Pre-composited annotation layer for a fixed spot layout.
+
+    Outlines and labels are rasterized once per layout and frame size. Every
+    outline pixel remembers the spot it belongs to, so a status change only
+    rewrites that spot's pixels instead of redrawing the whole layout. A
+    camera-shift offset translates the stored pixel indices; the
+    translation is cached until the offset changes.
+    """
+
+    def __init__(self,
+                 contours,
+                 labels,
+                 font_color=COLOR_WHITE,
+                 free_color=COLOR_GREEN,
+                 occupied_color=COLOR_BLUE,
+                 border_thickness=2,
+                 font=open_cv.FONT_HERSHEY_SIMPLEX,
+                 font_scale=0.5,
+                 line_thickness=1):
+        self.contours = [np.asarray(c, dtype=np.int32) for c in contours]
+        self.labels = list(labels)
+        self.font_color = font_color
+        self.free_color = free_color
+        self.occupied_color = occupied_color
+        self.border_thickness = border_thickness
+        self.font = font
+        self.font_scale = font_scale
+        self.line_thickness = line_thickness
+
+        self.shape = None
+        self.statuses = None
+        self.outline_index = None
+        self.outline_colors = None
+        self.spot_slices = []
+        self.label_index = None
+        self.label_alpha = None
+        self.label_colors = None
+        self.shifted = None
+
+    def build(self, shape):
+        height, width = shape[:2]
+        owner = np.full((height, width), -1, dtype=np.int32)
+
+        for index, coordinates in enumerate(self.contours):
+            rect = open_cv.boundingRect(coordinates)
+            pad = self.border_thickness
+            x0, y0 = max(rect[0] - pad, 0), max(rect[1] - pad, 0)
+            x1 = min(rect[0] + rect[2] + pad, width)
+            y1 = min(rect[1] + rect[3] + pad, height)
+            if x1 <= x0 or y1 <= y0:
+                continue
+
+            local = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+            open_cv.drawContours(local,
+                                 [coordinates - (x0, y0)],
+                                 contourIdx=-1,
+                                 color=255,
+                                 thickness=self.border_thickness,
+                                 lineType=open_cv.LINE_8)
+            owner[y0:y1, x0:x1][local == 255] = index
+
+        flat_owner = owner.ravel()
+        drawn = np.flatnonzero(flat_owner >= 0)
+        order = np.argsort(flat_owner[drawn], kind="stable")
+        self.outline_index = drawn[order]
+        owners = flat_owner[self.outline_index]
+
+        bounds = np.searchsorted(owners, np.arange(len(self.contours) + 1))
+        self.spot_slices = [slice(bounds[i], bounds[i + 1]) for i in range(len(self.contours))]
+
+        labels = np.zeros((height, width), dtype=np.uint8)
+        for coordinates, label in zip(self.contours, self.labels):
+            origin = label_origin(coordinates)
+            if origin is None:
+                continue
+            open_cv.putText(labels,
+                            label,
+                            origin,
+                            self.font,
+                            self.font_scale,
+                            255,
+                            self.line_thickness,
+                            open_cv.LINE_AA)
+
+        flat_labels = labels.ravel()
+        self.label_index = np.flatnonzero(flat_labels)
+        self.label_alpha = (flat_labels[self.label_index].astype(np.float32) / 255.0)[:, None]
+        self.label_colors = np.array(self.font_color, dtype=np.float32) * self.label_alpha
+
+        self.shape = tuple(shape)
+        self.statuses = [False] * len(self.contours)
+        self.outline_colors = np.empty((len(self.outline_index), 3), dtype=np.uint8)
+        self.outline_colors[:] = self.occupied_color
+        self.shifted = None
+        logging.debug("overlay built: %s outline pixels, %s label pixels",
+                      len(self.outline_index), len(self.label_index))
+
+    def update(self, statuses):
+        for index, status in enumerate(statuses):
+            if status != self.statuses[index]:
+                self.statuses[index] = status
+                color = self.free_color if status else self.occupied_color
+                self.outline_colors[self.spot_slices[index]] = color
+
+    def render(self, frame, statuses, offset=(0, 0)):
+        if self.shape != frame.shape:
+            self.build(frame.shape)
+        self.update(statuses)
+
+        outline_index, outline_keep, label_index, label_keep = self.translate(tuple(offset))
+        outline_colors = self.outline_colors if outline_keep is None else self.outline_colors[outline_keep]
+        label_alpha = self.label_alpha if label_keep is None else self.label_alpha[label_keep]
+        label_colors = self.label_colors if label_keep is None else self.label_colors[label_keep]
+
+        annotated = frame.copy()
+        pixels = annotated.reshape(-1, 3)
+        pixels[outline_index] = outline_colors
+
+        background = pixels[label_index].astype(np.float32)
+        pixels[label_index] = (background * (1.0 - label_alpha) + label_colors).astype(np.uint8)
+        return annotated
+
+    def translate(self, offset):
+        """
+        Return the outline and label pixel indices moved by `offset`, each with
+        the mask of pixels still inside the frame (None when unshifted).
+        """
+        if offset == (0, 0):
+            return self.outline_index, None, self.label_index, None
+        if self.shifted is not None and self.shifted[0] == offset:
+            return self.shifted[1]
+
+        height, width = self.shape[:2]
+        dx, dy = offset
+
+        def shift(index):
+            y, x = np.divmod(index, width)
+            x += dx
+            y += dy
+            keep = (x >= 0) & (x < width) & (y >= 0) & (y < height)
+            return y[keep] * width + x[keep], keep
+
+        outline_index, outline_keep = shift(self.outline_index)
+        label_index, label_keep = shift(self.label_index)
+        self.shifted = (offset, (outline_index, outline_keep, label_index, label_keep))
+        return self.shifted[1]
+
+
+class AsyncVideoWriter:
+    """
+    `VideoWriter` fed from a background thread.
+
+    The writer is opened on the first frame so the output size always matches
+    the rendered frames. `write` only waits when the encoder falls
+    `queue_size` frames behind; frames are never dropped, since a missing
+    frame would shift the timing of the rest of the recording.
+    """
+
+    def __init__(self, path, fps, fourcc="mp4v", queue_size=64):
+        self.path = path
+        self.fps = fps
+        self.fourcc = open_cv.VideoWriter_fourcc(*fourcc)
+        self.written = 0
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._writer = None
+        self._thread = threading.Thread(target=self._loop, name="video-writer", daemon=True)
+        self._thread.start()
+
+    def write(self, frame):
+        self._queue.put(frame)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+        logging.info("Wrote %s frames to %s at %s fps", self.written, self.path, self.fps)
+
+    def _loop(self):
+        while True:
+            frame = self._queue.get()
+            if frame is None:
+                break
+
+            if self._writer is None:
+                height, width = frame.shape[:2]
+                self._writer = open_cv.VideoWriter(self.path, self.fourcc, self.fps, (width, height))
+                if not self._writer.isOpened():
+                    logging.error("Could not open video writer for %s", self.path)
+
+            self._writer.write(frame)
+            self.written += 1
+
+        if self._writer is not None:
+            self._writer.release()
+
+
+class RenderThread(threading.Thread):
+    """
+    Draws annotated frames away from the analysis loop.
+
+    The recording is sampled on the video clock: a frame is written whenever
+    `position_in_seconds` reaches the next tick of the writer's fps, and
+    repeated when the clock skips ticks, so the file keeps the source timing.
+    Recorded frames wait for the render queue rather than being dropped.
+    Preview frames are best effort: submissions arriving faster than
+    `render_fps` of wall-clock time are ignored without copying anything,
+    and those finding the queue full are counted in `dropped`. HighGUI is
+    not thread-safe, so finished preview frames are handed back and the
+    thread that calls `submit` shows them with `show`; the 'q' key is
+    reported through `quit_requested`. With neither a window nor a writer
+    there is nothing to draw for, so the thread is not started and `submit`
+    does nothing.
+    """
+
+    KEY_QUIT = ord("q")
+    QUEUE_SIZE = 4
+
+    def __init__(self, overlay, window=None, render_fps=None, writer=None):
+        super().__init__(name="renderer", daemon=True)
+        self.overlay = overlay
+        self.window = window
+        self.writer = writer
+        self.interval = 1.0 / render_fps if render_fps else 0.0
+        self.quit_requested = threading.Event()
+        self.rendered = 0
+        self.dropped = 0
+        self.active = window is not None or writer is not None
+
+        self._queue = queue.Queue(maxsize=self.QUEUE_SIZE)
+        self._shown = queue.Queue(maxsize=1)
+        self._last_show = 0.0
+        self._last_tick = None
+
+    def set_overlay(self, overlay):
+        """Use `overlay` for frames submitted from now on; it is built on the render thread."""
+        self.overlay = overlay
+
+    def start(self):
+        if self.active:
+            super().start()
+
+    def submit(self, frame, statuses, position_in_seconds, offset=(0, 0)):
+        if not self.active:
+            return
+
+        repeats = self._record_repeats(position_in_seconds)
+
+        show = False
+        if self.window is not None:
+            now = time.monotonic()
+            if now - self._last_show >= self.interval:
+                self._last_show = now
+                show = True
+
+        if not repeats and not show:
+            return
+
+        item = (self.overlay, frame, tuple(statuses), tuple(offset), show, repeats)
+        if repeats:
+            self._queue.put(item)
+            return
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def show(self):
+        """Display the latest finished preview frame; call from the thread that owns the window."""
+        try:
+            annotated = self._shown.get_nowait()
+        except queue.Empty:
+            return
+
+        open_cv.imshow(self.window, annotated)
+        if open_cv.waitKey(1) == RenderThread.KEY_QUIT:
+            self.quit_requested.set()
+
+    def stop(self):
+        if self.active:
+            self._queue.put(None)
+            self.join()
+            logging.info("Rendered %s frames (%s preview frames dropped)", self.rendered, self.dropped)
+        if self.writer is not None:
+            self.writer.close()
+        if self.window is not None:
+            open_cv.destroyAllWindows()
+
+    def _record_repeats(self, position_in_seconds):
+        """Return how many times the next frame belongs in the recording: 0 between ticks, more over gaps."""
+        if self.writer is None:
+            return 0
+
+        tick = int(position_in_seconds * self.writer.fps + 1e-6)
+        if self._last_tick is None:
+            repeats = 1
+        else:
+            repeats = max(tick - self._last_tick, 0)
+        if repeats:
+            self._last_tick = tick
+        return repeats
+
+    def run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            overlay, frame, statuses, offset, show, repeats = item
+            annotated = overlay.render(frame, statuses, offset)
+            self.rendered += 1
+
+            for _ in range(repeats):
+                self.writer.write(annotated)
+
+            if show:
+                self._publish(annotated)
+
+    def _publish(self, annotated):
+        try:
+            self._shown.get_nowait()
+        except queue.Empty:
+            pass
+        self._shown.put_nowait(annotated)
@@ -0,0 +1,132 @@
+import argparse
+import logging
+import time
+
+import numpy as np
+
+from motion_detector import MotionDetector
+from roi_archive import RoiArchiveReader
+from scorers import SCORERS, create_scorer
+
+logger = logging.getLogger(__name__)
+
+
+def score_archive(reader, scorer):
+    """Score every archived frame; returns (timestamps, scores) with scores shaped (spots, frames)."""
+    scorer.prepare([MotionDetector.compile_spot(p)[2] for p in reader.spots])
+
+    frames = len(reader)
+    timestamps = np.empty(frames, dtype=np.float64)
+    scores = np.empty((len(reader.spots), frames), dtype=np.float64)
+
+    start = 0
+    for chunk in range(len(reader.chunks)):
+        chunk_timestamps, rows = reader.chunk(chunk)
+        end = start + len(rows)
+        timestamps[start:end] = chunk_timestamps
+        for index in range(len(reader.spots)):
+            scores[index, start:end] = scorer.scores(reader.crops(rows, index), index)
+        start = end
+
+    return timestamps, scores
+
+
+def debounce(free, timestamps, delay=MotionDetector.DETECT_DELAY):
+    """
+    Apply the `MotionDetector` status delay to one spot's raw free/occupied series.
+
+    A change commits on the first later frame at least `delay` seconds after
+    the raw status started to differ, provided it kept differing until then.
+    Works on runs of equal raw status with array operations instead of a
+    Python step per frame. Returns the committed (time, status) changes.
+    """
+    transitions = []
+    status = False
+
+    edges = np.flatnonzero(np.diff(free.astype(np.int8))) + 1
+    starts = np.concatenate(([0], edges))
+    ends = np.concatenate((edges, [len(free)]))
+
+    for start, end in zip(starts, ends):
+        if free[start] == status:
+            continue
+
+        elapsed = timestamps[start + 1:end] - timestamps[start]
+        late_enough = np.flatnonzero(elapsed >= delay)
+        if len(late_enough):
+            status = bool(free[start])
+            transitions.append((float(timestamps[start + 1 + late_enough[0]]), status))
+
+    return transitions
+
+
+def sweep(reader, scorer_name, thresholds, delay=MotionDetector.DETECT_DELAY):
+    """Replay the archive once per threshold, scoring it only once unless the scorer is stateful."""
+    results = []
+    scores = None
+    for threshold in thresholds:
+        scorer = create_scorer(scorer_name, threshold)
+        if scores is None or scorer.stateful:
+            started = time.perf_counter()
+            timestamps, scores = score_archive(reader, scorer)
+            logger.info("Scored %s frames x %s spots in %.2fs",
+                        scores.shape[1], scores.shape[0], time.perf_counter() - started)
+
+        free = scores < scorer.threshold
+        transitions = [debounce(spot_free, timestamps, delay) for spot_free in free]
+        results.append((scorer.threshold, free, transitions))
+    return results
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Re-scores an ROI archive captured with main.py --capture")
+
+    parser.add_argument("archive", help="ROI archive file")
+
+    parser.add_argument(
+        "--scorer",
+        dest="scorer",
+        default="laplacian",
+        choices=sorted(SCORERS),
+        help="Occupancy scorer backend",
+    )
+
+    parser.add_argument(
+        "--threshold",
+        dest="thresholds",
+        type=float,
+        nargs="+",
+        default=[None],
+        help="One or more thresholds to sweep (default: the scorer's own)",
+    )
+
+    parser.add_argument(
+        "--delay",
+        dest="delay",
+        type=float,
+        default=MotionDetector.DETECT_DELAY,
+        help="Seconds a status change must persist before it is committed",
+    )
+
+    return parser.parse_args()
+
+
+def main() -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)s | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    args = parse_args()
+
+    with RoiArchiveReader(args.archive) as reader:
+        logger.info("Replaying %s frames of %s spots from %s", len(reader), len(reader.spots), args.archive)
+        for threshold, free, transitions in sweep(reader, args.scorer, args.thresholds, args.delay):
+            logger.info("threshold=%s: %s committed changes, %.1f%% of raw spot-frames free",
+                        threshold,
+                        sum(len(t) for t in transitions),
+                        100.0 * free.mean() if free.size else 0.0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+import json
+import logging
+import mmap
+import queue
+import struct
+import threading
+import zlib
+
+import numpy as np
+
+MAGIC = b"PSDROI2\n"
+HEADER = struct.Struct("<Q")
+RECORD = struct.Struct("<IQ")
+
+
+class RoiArchiveError(Exception):
+    pass
+
+
+class RoiArchiveWriter:
+    """
+    Appends the grayscale crop of every spot's bounding rect, frame by frame.
+
+    Each frame becomes one row holding all crops back to back. Rows are
+    grouped into chunks of about `chunk_bytes` of raw crops, at least one
+    frame each, so buffer memory does not grow with the spot count. A chunk
+    stores its timestamps and the zlib-compressed row-to-row difference of
+    its crops, which is small for a mostly static lot. Compression runs on a
+    background thread.
+
+    The layout is written as a JSON header up front, and every chunk is
+    preceded by a (frames, size) record and flushed as soon as it is written,
+    so an archive whose writer never reached `close` is still readable up to
+    its last complete chunk. `close` adds an empty record marking the end.
+    """
+
+    CHUNK_BYTES = 16 * 1024 * 1024
+
+    def __init__(self, path, spots, rects, chunk_bytes=None, level=1, metadata=None):
+        self.path = path
+        self.rects = [tuple(int(v) for v in rect) for rect in rects]
+        self.level = level
+        self.row_size = sum(w * h for _, _, w, h in self.rects)
+        chunk_bytes = self.CHUNK_BYTES if chunk_bytes is None else chunk_bytes
+        self.chunk_frames = max(1, chunk_bytes // max(self.row_size, 1))
+
+        header = json.dumps({
+            "spots": [{"id": int(p["id"]), "coordinates": np.asarray(p["coordinates"]).tolist()} for p in spots],
+            "rects": self.rects,
+            "row_size": self.row_size,
+            "metadata": metadata or {},
+        }).encode("utf-8")
+
+        self._output = open(path, "wb")
+        self._output.write(MAGIC + HEADER.pack(len(header)) + header)
+        self._output.flush()
+        self._new_buffer()
+
+        self._queue = queue.Queue(maxsize=4)
+        self._thread = threading.Thread(target=self._loop, name="roi-archive", daemon=True)
+        self._thread.start()
+
+    def append(self, timestamp, grayed, offset=(0, 0)):
+        row = self._rows[self._count]
+        start = 0
+        dx, dy = offset
+        for x, y, w, h in self.rects:
+            row[start:start + w * h] = grayed[y + dy:y + dy + h, x + dx:x + dx + w].ravel()
+            start += w * h
+
+        self._timestamps[self._count] = timestamp
+        self._count += 1
+        if self._count == self.chunk_frames:
+            self._flush()
+
+    def close(self):
+        if self._count:
+            self._flush()
+        self._queue.put(None)
+        self._thread.join()
+
+        self._output.write(RECORD.pack(0, 0))
+        self._output.close()
+
+    def _new_buffer(self):
+        self._rows = np.empty((self.chunk_frames, self.row_size), dtype=np.uint8)
+        self._timestamps = np.empty(self.chunk_frames, dtype=np.float64)
+        self._count = 0
+
+    def _flush(self):
+        self._queue.put((self._timestamps[:self._count], self._rows[:self._count]))
+        self._new_buffer()
+
+    def _loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            timestamps, rows = item
+            deltas = rows.copy()
+            deltas[1:] -= rows[:-1]
+            payload = timestamps.tobytes() + zlib.compress(deltas.tobytes(), self.level)
+
+            self._output.write(RECORD.pack(len(rows), len(payload)) + payload)
+            self._output.flush()
+
+
+class RoiArchiveReader:
+    """
+    Memory-maps an archive written by `RoiArchiveWriter` and decodes it chunk by chunk.
+
+    `complete` is False for an archive whose writer stopped before `close`;
+    its chunks are read up to the last one written in full.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise RoiArchiveError("%s is empty" % path)
+
+        start = len(MAGIC) + HEADER.size
+        if self._map[:len(MAGIC)] != MAGIC or len(self._map) < start:
+            self.close()
+            raise RoiArchiveError("%s is not an ROI archive" % path)
+
+        (header_size,) = HEADER.unpack(self._map[len(MAGIC):start])
+        try:
+            header = json.loads(bytes(self._map[start:start + header_size]).decode("utf-8"))
+        except ValueError:
+            self.close()
+            raise RoiArchiveError("%s has a damaged header" % path)
+
+        self.spots = header["spots"]
+        self.rects = [tuple(rect) for rect in header["rects"]]
+        self.row_size = header["row_size"]
+        self.metadata = header["metadata"]
+        self.chunks, self.complete = self._scan(start + header_size)
+        if not self.complete:
+            logging.warning("%s was not closed cleanly, recovered %s complete chunks", path, len(self.chunks))
+
+        self.offsets = np.cumsum([0] + [w * h for _, _, w, h in self.rects])
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return sum(chunk["frames"] for chunk in self.chunks)
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def _scan(self, offset):
+        chunks = []
+        while offset + RECORD.size <= len(self._map):
+            frames, size = RECORD.unpack(self._map[offset:offset + RECORD.size])
+            if frames == 0:
+                return chunks, True
+
+            offset += RECORD.size
+            if offset + size > len(self._map) or size < frames * 8:
+                break
+            chunks.append({"offset": offset, "size": size, "frames": frames})
+            offset += size
+        return chunks, False
+
+    def chunk(self, index):
+        """Return (timestamps, rows) for one chunk; rows has one frame per row."""
+        chunk = self.chunks[index]
+        frames = chunk["frames"]
+        start = chunk["offset"]
+        split = start + frames * 8
+
+        with memoryview(self._map) as view:
+            timestamps = np.frombuffer(view[start:split], dtype=np.float64).copy()
+            rows = np.frombuffer(bytearray(zlib.decompress(view[split:start + chunk["size"]])), dtype=np.uint8)
+
+        # Undo the row-to-row difference in place; row-wise adds beat cumsum along axis 0.
+        rows = rows.reshape(frames, self.row_size)
+        for row in range(1, frames):
+            np.add(rows[row - 1], rows[row], out=rows[row])
+        return timestamps, rows
+
+    def crops(self, rows, index):
+        """View the crops of spot `index` in `rows` as a (frames, height, width) array."""
+        _, _, w, h = self.rects[index]
+        return rows[:, self.offsets[index]:self.offsets[index + 1]].reshape(len(rows), h, w)
@@ -0,0 +1,231 @@
+import logging
+import time
+
+import cv2 as open_cv
+import numpy as np
+
+
+class Scorer:
+    """
+    Decides whether a parking spot is free from its grayscale ROI.
+
+    Subclasses implement `score`, which returns a number that is compared
+    against `threshold`: values below it mean the spot is free. The time spent
+    in `score` is accumulated per spot so backends can be compared on cost.
+    `score_batch` scores a stack of crops of one spot at once, for replays;
+    backends whose scores depend on the threshold set `stateful`.
+    """
+
+    name = None
+    THRESHOLD = None
+    stateful = False
+
+    def __init__(self, threshold=None):
+        self.threshold = self.THRESHOLD if threshold is None else threshold
+        self.masks = []
+        self.costs = np.zeros(0)
+        self.calls = np.zeros(0, dtype=np.int64)
+
+    def prepare(self, masks):
+        self.masks = list(masks)
+        self.costs = np.zeros(len(self.masks))
+        self.calls = np.zeros(len(self.masks), dtype=np.int64)
+
+    def reindex(self, mapping, masks):
+        """
+        Switch to a new layout. `mapping[i]` is the old index of new spot `i`,
+        or None for a spot that is new or changed and starts from scratch.
+        """
+        costs = np.zeros(len(masks))
+        calls = np.zeros(len(masks), dtype=np.int64)
+        for index, old in enumerate(mapping):
+            if old is not None:
+                costs[index] = self.costs[old]
+                calls[index] = self.calls[old]
+
+        self.masks = list(masks)
+        self.costs = costs
+        self.calls = calls
+
+    def status(self, roi, index):
+        start = time.perf_counter()
+        value = self.score(roi, index)
+        self.costs[index] += time.perf_counter() - start
+        self.calls[index] += 1
+        logging.debug("%s score for spot %s: %s", self.name, index, value)
+        return value < self.threshold
+
+    def scores(self, rois, index):
+        start = time.perf_counter()
+        values = self.score_batch(rois, index)
+        self.costs[index] += time.perf_counter() - start
+        self.calls[index] += len(rois)
+        return values
+
+    def score(self, roi, index):
+        raise NotImplementedError
+
+    def score_batch(self, rois, index):
+        return np.array([self.score(roi, index) for roi in rois], dtype=np.float64)
+
+    def cost_report(self):
+        """Return mean seconds per evaluation for each spot (NaN if never scored)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.costs / self.calls
+
+    def log_cost_report(self):
+        per_spot = self.cost_report()
+        evaluated = per_spot[~np.isnan(per_spot)]
+        if len(evaluated) == 0:
+            return
+
+        logging.info("Scorer '%s': %.1f us per spot on average, %.1f us worst spot, %s evaluations",
+                     self.name,
+                     evaluated.mean() * 1e6,
+                     evaluated.max() * 1e6,
+                     int(self.calls.sum()))
+
+
+class LaplacianScorer(Scorer):
+    """Mean absolute Laplacian inside the spot; texture from a car raises it."""
+
+    name = "laplacian"
+    THRESHOLD = 1.4
+
+    def score(self, roi, index):
+        laplacian = open_cv.Laplacian(roi, open_cv.CV_64F)
+        return np.mean(np.abs(laplacian * self.masks[index]))
+
+    def score_batch(self, rois, index):
+        # Same 4-neighbour kernel and reflect-101 border as cv2.Laplacian, over all frames at once.
+        padded = np.pad(rois.astype(np.int16), ((0, 0), (1, 1), (1, 1)), mode="reflect")
+        laplacian = padded[:, :-2, 1:-1] + padded[:, 2:, 1:-1]
+        laplacian += padded[:, 1:-1, :-2]
+        laplacian += padded[:, 1:-1, 2:]
+        laplacian -= padded[:, 1:-1, 1:-1] * np.int16(4)
+        np.abs(laplacian, out=laplacian)
+
+        mask = self.masks[index]
+        return np.einsum("kij,ij->k", laplacian, mask.astype(np.int16), dtype=np.int64) / mask.size
+
+
+class BackgroundScorer(Scorer):
+    """
+    Mean absolute difference from a running-average background of each spot.
+
+    A background is only taken once the spot's crop has stayed still for
+    `stable_frames` analysed frames; until then the spot reads as occupied.
+    The background keeps learning while the spot scores as free, which
+    follows gradual lighting changes without letting a parked car fade in.
+    Whenever the crop settles on a view with less texture than the
+    background it becomes the new background, since an empty spot is
+    smoother than a car; a spot first seeded on a car recovers this way once
+    the car leaves.
+    """
+
+    name = "background"
+    THRESHOLD = 12.0
+    stateful = True
+    LEARNING_RATE = 0.02
+    STABLE_FRAMES = 25
+    STILL_LEVEL = 2.0
+
+    def __init__(self, threshold=None, learning_rate=None, stable_frames=None):
+        super().__init__(threshold)
+        self.learning_rate = self.LEARNING_RATE if learning_rate is None else learning_rate
+        self.stable_frames = self.STABLE_FRAMES if stable_frames is None else stable_frames
+        self.backgrounds = []
+        self.textures = []
+        self.previous = []
+        self.still = []
+
+    def prepare(self, masks):
+        super().prepare(masks)
+        self.backgrounds = [None] * len(self.masks)
+        self.textures = [None] * len(self.masks)
+        self.previous = [None] * len(self.masks)
+        self.still = [0] * len(self.masks)
+
+    def reindex(self, mapping, masks):
+        self.backgrounds = [None if old is None else self.backgrounds[old] for old in mapping]
+        self.textures = [None if old is None else self.textures[old] for old in mapping]
+        self.previous = [None if old is None else self.previous[old] for old in mapping]
+        self.still = [0 if old is None else self.still[old] for old in mapping]
+        super().reindex(mapping, masks)
+
+    def score(self, roi, index):
+        mask = self.masks[index]
+        current = roi.astype(np.float32)
+
+        previous = self.previous[index]
+        if previous is not None and previous.shape == current.shape and \
+                np.mean(np.abs(current - previous)[mask]) < self.STILL_LEVEL:
+            self.still[index] += 1
+        else:
+            self.still[index] = 0
+        self.previous[index] = current
+
+        background = self.backgrounds[index]
+        if background is not None and background.shape != current.shape:
+            background = self.backgrounds[index] = self.textures[index] = None
+
+        if self.still[index] == self.stable_frames:
+            texture = float(np.mean(np.abs(open_cv.Laplacian(roi, open_cv.CV_32F))[mask]))
+            if background is None or texture < self.textures[index]:
+                logging.debug("%s background for spot %s seeded (texture %.2f)", self.name, index, texture)
+                background = self.backgrounds[index] = current.copy()
+                self.textures[index] = texture
+
+        if background is None:
+            return float("inf")
+
+        value = float(np.mean(np.abs(current - background)[mask]))
+        if value < self.threshold:
+            open_cv.accumulateWeighted(current, background, self.learning_rate)
+        return value
+
+
+class EdgeDensityScorer(Scorer):
+    """Fraction of spot pixels on a Canny edge."""
+
+    name = "edges"
+    THRESHOLD = 0.06
+    CANNY_LOW = 50
+    CANNY_HIGH = 150
+
+    def score(self, roi, index):
+        mask = self.masks[index]
+        edges = open_cv.Canny(roi, self.CANNY_LOW, self.CANNY_HIGH)
+        return np.count_nonzero(edges[mask]) / max(np.count_nonzero(mask), 1)
+
+
+class HistogramScorer(Scorer):
+    """Spread of the intensity histogram inside the spot; bare asphalt is flat."""
+
+    name = "histogram"
+    THRESHOLD = 18.0
+
+    def score(self, roi, index):
+        mask = self.masks[index]
+        histogram = np.bincount(roi[mask], minlength=256).astype(np.float64)
+        total = histogram.sum()
+        if total == 0:
+            return 0.0
+
+        levels = np.arange(256)
+        mean = np.dot(levels, histogram) / total
+        return float(np.sqrt(np.dot((levels - mean) ** 2, histogram) / total))
+
+
+SCORERS = {scorer.name: scorer for scorer in (LaplacianScorer,
+                                               BackgroundScorer,
+                                               EdgeDensityScorer,
+                                               HistogramScorer)}
+
+
+def create_scorer(name, threshold=None):
+    try:
+        scorer = SCORERS[name]
+    except KeyError:
+        raise ValueError("Unknown scorer '%s', expected one of: %s" % (name, ", ".join(SCORERS)))
+    return scorer(threshold)
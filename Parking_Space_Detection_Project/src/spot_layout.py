@@ -0,0 +1,157 @@
+import os
+import tempfile
+
+import cv2 as open_cv
+import numpy as np
+import yaml
+
+
+class GridIndex:
+    """Uniform grid over the image mapping cells to the ids whose rect overlaps them."""
+
+    def __init__(self, cell_size=64):
+        self.cell_size = cell_size
+        self.cells = {}
+        self.rects = {}
+
+    def insert(self, key, rect):
+        self.rects[key] = rect
+        for cell in self._cells(rect):
+            self.cells.setdefault(cell, set()).add(key)
+
+    def remove(self, key):
+        rect = self.rects.pop(key)
+        for cell in self._cells(rect):
+            bucket = self.cells[cell]
+            bucket.discard(key)
+            if not bucket:
+                del self.cells[cell]
+
+    def query_point(self, x, y):
+        cell = (x // self.cell_size, y // self.cell_size)
+        return [key for key in self.cells.get(cell, ())
+                if self._contains(self.rects[key], x, y)]
+
+    def query_rect(self, rect):
+        found = set()
+        for cell in self._cells(rect):
+            found.update(self.cells.get(cell, ()))
+        return [key for key in found if self._intersects(self.rects[key], rect)]
+
+    def _cells(self, rect):
+        x, y, w, h = rect
+        size = self.cell_size
+        for cx in range(x // size, (x + max(w, 1) - 1) // size + 1):
+            for cy in range(y // size, (y + max(h, 1) - 1) // size + 1):
+                yield cx, cy
+
+    @staticmethod
+    def _contains(rect, x, y):
+        return rect[0] <= x < rect[0] + rect[2] and rect[1] <= y < rect[1] + rect[3]
+
+    @staticmethod
+    def _intersects(a, b):
+        return (a[0] < b[0] + b[2] and b[0] < a[0] + a[2] and
+                a[1] < b[1] + b[3] and b[1] < a[1] + a[3])
+
+
+class SpotLayout:
+    """
+    In-memory parking layout: spot id -> four corner points, plus the
+    optional zone path of each spot.
+
+    Keeps a `GridIndex` of each spot's bounding rect, grown by `margin`
+    pixels so the index also covers the outline thickness and label.
+    """
+
+    def __init__(self, spots=None, margin=20, cell_size=64):
+        self.margin = margin
+        self.spots = {}
+        self.zones = {}
+        self.index = GridIndex(cell_size)
+        for spot in spots or []:
+            self.add(spot["id"], spot["coordinates"], spot.get("zone"))
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        with open(path, "r") as data:
+            points = yaml.load(data, Loader=yaml.FullLoader)
+        return cls(points or [], **kwargs)
+
+    @property
+    def next_id(self):
+        return max(self.spots, default=-1) + 1
+
+    def __len__(self):
+        return len(self.spots)
+
+    def __contains__(self, spot_id):
+        return spot_id in self.spots
+
+    def coordinates(self, spot_id):
+        return self.spots[spot_id]
+
+    def add(self, spot_id, coordinates, zone=None):
+        coordinates = np.array(coordinates, dtype=np.int32).reshape(-1, 2)
+        self.spots[spot_id] = coordinates
+        if zone is not None:
+            self.zones[spot_id] = zone
+        self.index.insert(spot_id, self.bounds(spot_id))
+
+    def remove(self, spot_id):
+        self.index.remove(spot_id)
+        self.zones.pop(spot_id, None)
+        return self.spots.pop(spot_id)
+
+    def move(self, spot_id, coordinates):
+        zone = self.zones.get(spot_id)
+        self.remove(spot_id)
+        self.add(spot_id, coordinates, zone)
+
+    def bounds(self, spot_id):
+        """Bounding rect of the spot including the drawing margin."""
+        x, y, w, h = open_cv.boundingRect(self.spots[spot_id])
+        return (x - self.margin, y - self.margin, w + 2 * self.margin, h + 2 * self.margin)
+
+    def hit_test(self, x, y):
+        """Return the most recently added spot containing (x, y), or None."""
+        hits = [spot_id for spot_id in self.index.query_point(x, y)
+                if open_cv.pointPolygonTest(self.spots[spot_id], (float(x), float(y)), False) >= 0]
+        return max(hits, default=None)
+
+    def in_rect(self, rect):
+        return sorted(self.index.query_rect(rect))
+
+    def to_data(self):
+        data = []
+        for spot_id, coordinates in sorted(self.spots.items()):
+            spot = {"id": int(spot_id), "coordinates": coordinates.tolist()}
+            if spot_id in self.zones:
+                spot["zone"] = self.zones[spot_id]
+            data.append(spot)
+        return data
+
+    @staticmethod
+    def _format(spot):
+        points = ",".join("[%d,%d]" % (x, y) for x, y in spot["coordinates"])
+        text = "-\n          id: %d\n          coordinates: [%s]\n" % (spot["id"], points)
+        if "zone" in spot:
+            zone = yaml.safe_dump(spot["zone"], default_flow_style=True, width=float("inf")).strip()
+            if zone.endswith("\n..."):
+                zone = zone[:-4].strip()
+            text += "          zone: %s\n" % zone
+        return text
+
+    def save(self, path):
+        """Write the whole layout to a temporary file and rename it over `path`."""
+        directory = os.path.dirname(os.path.abspath(path))
+        handle, temporary = tempfile.mkstemp(dir=directory, prefix=".", suffix=".yml.tmp")
+        try:
+            with os.fdopen(handle, "w") as output:
+                for spot in self.to_data():
+                    output.write(self._format(spot))
+            os.chmod(temporary, 0o644)
+            os.replace(temporary, path)
+        except BaseException:
+            os.unlink(temporary)
+            raise
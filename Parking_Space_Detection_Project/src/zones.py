@@ -0,0 +1,89 @@
+class Zone:
+    __slots__ = ("name", "parent", "children", "total", "free")
+
+    def __init__(self, name, parent=None):
+        self.name = name
+        self.parent = parent
+        self.children = {}
+        self.total = 0
+        self.free = 0
+
+    @property
+    def occupied(self):
+        return self.total - self.free
+
+    @property
+    def path(self):
+        names = []
+        zone = self
+        while zone.parent is not None:
+            names.append(zone.name)
+            zone = zone.parent
+        return tuple(reversed(names))
+
+    def child(self, name):
+        zone = self.children.get(name)
+        if zone is None:
+            zone = self.children[name] = Zone(name, self)
+        return zone
+
+
+class ZoneTree:
+    """
+    Lot -> level -> row hierarchy with running free/occupied counts.
+
+    Spots name their zone with an optional `zone` entry in the layout, either
+    a list such as `[level 2, row C]` or a string `level 2/row C`; spots
+    without one belong to the lot itself. Every spot starts occupied, matching
+    the detector's initial statuses, and `update` adjusts the counts of the
+    spot's zone and all its ancestors when a status change commits.
+    """
+
+    def __init__(self, spots, name="lot"):
+        self.root = Zone(name)
+        self.leaves = []
+        for spot in spots:
+            zone = self.root
+            for part in self.zone_path(spot):
+                zone = zone.child(part)
+            self.leaves.append(zone)
+
+            while zone is not None:
+                zone.total += 1
+                zone = zone.parent
+
+    @staticmethod
+    def zone_path(spot):
+        zone = spot.get("zone")
+        if zone is None:
+            return ()
+        if isinstance(zone, str):
+            return tuple(part.strip() for part in zone.split("/") if part.strip())
+        return tuple(str(part) for part in zone)
+
+    def update(self, index, free):
+        delta = 1 if free else -1
+        zone = self.leaves[index]
+        while zone is not None:
+            zone.free += delta
+            zone = zone.parent
+
+    def find(self, path=()):
+        if isinstance(path, str):
+            path = self.zone_path({"zone": path})
+        zone = self.root
+        for part in path:
+            zone = zone.children[part]
+        return zone
+
+    def counts(self, path=()):
+        """Return (free, occupied) for the zone at `path`; the whole lot by default."""
+        zone = self.find(path)
+        return zone.free, zone.occupied
+
+    def walk(self):
+        stack = [self.root]
+        while stack:
+            zone = stack.pop()
+            yield zone
+            stack.extend(reversed(list(zone.children.values())))